@@ -93,7 +93,7 @@ class MaasHelper:
         """
         maas = SnapCache()[MAAS_SNAP_NAME]
         service = maas.services.get(MAAS_SERVICE, {})
-        return service.get("activate", False)
+        return service.get("active", False)
 
     @staticmethod
     def set_running(enable: bool) -> None:
@@ -4,15 +4,21 @@
 
 import asyncio
 import logging
+import os
 from pathlib import Path
 
 import pytest
 import yaml
 from pytest_operator.plugin import OpsTest
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 logger = logging.getLogger(__name__)
 
-METADATA = yaml.safe_load(Path("./charmcraft.yaml").read_text())
+METADATA = yaml.load(Path("./charmcraft.yaml").read_bytes(), Loader=SafeLoader)
 APP_NAME = METADATA["name"]
 
 
@@ -22,8 +28,11 @@ async def test_build_and_deploy(ops_test: OpsTest):
 
     Assert on the unit status before any relations/configurations take place.
     """
-    # Build and deploy charm from local source folder
-    charm = await ops_test.build_charm(".")
+    # Build and deploy charm from local source folder, unless a prebuilt one is given
+    if charm_path := os.environ.get("CHARM_PATH"):
+        charm = Path(charm_path)
+    else:
+        charm = await ops_test.build_charm(".")
 
     # Deploy the charm and wait for waiting/idle status
     await asyncio.gather(
@@ -40,24 +49,26 @@ async def test_region_integration(ops_test: OpsTest):
 
     Assert that the charm is active if the integration is established.
     """
+    # Start deploying the database while the region charm is being built
+    database = asyncio.ensure_future(
+        ops_test.model.deploy(
+            "postgresql",
+            application_name="postgresql",
+            channel="14/stable",
+            trust=True,
+        )
+    )
+
     # Build and deploy region charm from local source folder
     region_charm = await ops_test.build_charm("../maas-region/")
 
-    # Deploy the region charm and wait for active/idle status
+    # Deploy the region charm and wait for both to settle, they are independent
     await asyncio.gather(
+        database,
         ops_test.model.deploy(region_charm, application_name="maas-region"),
         ops_test.model.wait_for_idle(
             apps=["maas-region"], status="waiting", raise_on_blocked=True, timeout=1000
         ),
-    )
-
-    await asyncio.gather(
-        ops_test.model.deploy(
-            "postgresql",
-            application_name="postgresql",
-            channel="14/stable",
-            trust=True,
-        ),
         ops_test.model.wait_for_idle(
             apps=["postgresql"], status="active", raise_on_blocked=True, timeout=1000
         ),
@@ -59,9 +59,15 @@ class TestHelperSnapCache(unittest.TestCase):
     @patch("helper.SnapCache", autospec=True)
     def test_is_running(self, mock_snap):
         maas = self._setup_snap(mock_snap, present=True)
-        maas.services.return_value = {MAAS_SERVICE: {"activate": True}}
+        type(maas).services = PropertyMock(return_value={MAAS_SERVICE: {"active": True}})
         self.assertTrue(MaasHelper.is_running())
 
+    @patch("helper.SnapCache", autospec=True)
+    def test_is_not_running(self, mock_snap):
+        maas = self._setup_snap(mock_snap, present=True)
+        type(maas).services = PropertyMock(return_value={MAAS_SERVICE: {"active": False}})
+        self.assertFalse(MaasHelper.is_running())
+
     @patch("helper.SnapCache", autospec=True)
     def test_set_running(self, mock_snap):
         maas = self._setup_snap(mock_snap, present=True)
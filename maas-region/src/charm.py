@@ -4,6 +4,8 @@
 
 """Charm the application."""
 
+import functools
+import itertools
 import json
 import logging
 import random
@@ -39,29 +41,47 @@ MAAS_HTTPS_PORT = 5443
 MAAS_REGION_METRICS_PORT = 5239
 MAAS_CLUSTER_METRICS_PORT = MAAS_HTTP_PORT
 
-MAAS_REGION_PORTS = [
-    ops.Port("udp", 53),  # named
-    ops.Port("udp", 67),  # dhcpd
-    ops.Port("udp", 69),  # tftp
-    ops.Port("udp", 123),  # chrony
-    ops.Port("udp", 323),  # chrony
-    *[ops.Port("udp", p) for p in range(5241, 5247 + 1)],  # Internal services
-    ops.Port("tcp", 53),  # named
-    ops.Port("tcp", 3128),  # squid
-    ops.Port("tcp", 8000),  # squid
-    ops.Port("tcp", MAAS_HTTP_PORT),  # API
-    ops.Port("tcp", MAAS_HTTPS_PORT),  # API
-    ops.Port("tcp", MAAS_REGION_METRICS_PORT),
-    *[ops.Port("tcp", p) for p in range(5241, 5247 + 1)],  # Internal services
-    *[ops.Port("tcp", p) for p in range(5250, 5270 + 1)],  # RPC Workers
-    *[ops.Port("tcp", p) for p in range(5270, 5274 + 1)],  # Temporal
-    *[ops.Port("tcp", p) for p in range(5280, 5284 + 1)],  # Temporal
-]
+MAAS_REGION_PORTS = frozenset(
+    itertools.chain(
+        (
+            ops.Port("udp", 53),  # named
+            ops.Port("udp", 67),  # dhcpd
+            ops.Port("udp", 69),  # tftp
+            ops.Port("udp", 123),  # chrony
+            ops.Port("udp", 323),  # chrony
+        ),
+        (ops.Port("udp", p) for p in range(5241, 5247 + 1)),  # Internal services
+        (
+            ops.Port("tcp", 53),  # named
+            ops.Port("tcp", 3128),  # squid
+            ops.Port("tcp", 8000),  # squid
+            ops.Port("tcp", MAAS_HTTP_PORT),  # API
+            ops.Port("tcp", MAAS_HTTPS_PORT),  # API
+            ops.Port("tcp", MAAS_REGION_METRICS_PORT),
+        ),
+        (ops.Port("tcp", p) for p in range(5241, 5247 + 1)),  # Internal services
+        (ops.Port("tcp", p) for p in range(5250, 5270 + 1)),  # RPC Workers
+        (ops.Port("tcp", p) for p in range(5270, 5274 + 1)),  # Temporal
+        (ops.Port("tcp", p) for p in range(5280, 5284 + 1)),  # Temporal
+    )
+)
 
 MAAS_ADMIN_SECRET_LABEL = "maas-admin"
 MAAS_ADMIN_SECRET_KEY = "maas-admin-secret-uri"
 
 
+@functools.lru_cache(maxsize=1)
+def _fqdn() -> str:
+    """Get the FQDN of this machine.
+
+    The lookup may hit DNS, so it is only done once per hook.
+
+    Returns:
+        str: the fully qualified domain name
+    """
+    return socket.getfqdn()
+
+
 @trace_charm(
     tracing_endpoint="charm_tracing_endpoint",
     extra_types=[
@@ -227,7 +247,7 @@ class MaasRegionCharm(ops.CharmBase):
         Returns:
             str: either `region` of `region+rack`
         """
-        has_agent = self.maas_region.gather_rack_units().get(socket.getfqdn())
+        has_agent = self.maas_region.gather_rack_units().get(_fqdn())
         return "region+rack" if has_agent else "region"
 
     def set_peer_data(
@@ -314,7 +334,7 @@ class MaasRegionCharm(ops.CharmBase):
         return False
 
     def _get_regions(self) -> List[str]:
-        eps = [socket.getfqdn()]
+        eps = [_fqdn()]
         if peers := self.peers:
             for u in peers.units:
                 if addr := self.get_peer_data(u, "system-name"):
@@ -327,20 +347,15 @@ class MaasRegionCharm(ops.CharmBase):
         )
         if relation := self.model.get_relation(MAAS_API_RELATION):
             app_name = f"api-{self.app.name}"
+            server_id = f"{app_name}-{self.unit.name.replace('/', '-')}"
+            bind_address = self.bind_address
             data = [
                 {
                     "service_name": "haproxy_service" if MAAS_PROXY_PORT == 80 else app_name,
                     "service_host": "0.0.0.0",
                     "service_port": MAAS_PROXY_PORT,
                     "service_options": ["mode http", "balance leastconn"],
-                    "servers": [
-                        (
-                            f"{app_name}-{self.unit.name.replace('/', '-')}",
-                            self.bind_address,
-                            region_port,
-                            [],
-                        )
-                    ],
+                    "servers": [(server_id, bind_address, region_port, [])],
                 },
             ]
             if self.config["tls_mode"] != "disabled":
@@ -349,17 +364,12 @@ class MaasRegionCharm(ops.CharmBase):
                         "service_name": "agent_service",
                         "service_host": "0.0.0.0",
                         "service_port": MAAS_PROXY_PORT,
-                        "servers": [
-                            (
-                                f"{app_name}-{self.unit.name.replace('/', '-')}",
-                                self.bind_address,
-                                MAAS_HTTP_PORT,
-                                [],
-                            )
-                        ],
+                        "servers": [(server_id, bind_address, MAAS_HTTP_PORT, [])],
                     }
                 )
-            relation.data[self.unit]["services"] = yaml.safe_dump(data)
+            services = yaml.safe_dump(data)
+            if relation.data[self.unit].get("services") != services:
+                relation.data[self.unit]["services"] = services
 
     def _update_tls_config(self) -> None:
         """Enable or disable TLS in MAAS."""
@@ -455,13 +465,15 @@ class MaasRegionCharm(ops.CharmBase):
     def _on_api_endpoint_changed(self, event: ops.RelationEvent) -> None:
         logger.info(event)
         self._update_ha_proxy()
+        # these must stay sequential: the enrollment secret published with the
+        # tokens is written by `maas init`, and the ops model is not thread-safe
         self._initialize_maas()
         if self.unit.is_leader():
             self._publish_tokens()
 
     def _on_maas_peer_changed(self, event: ops.RelationEvent) -> None:
         logger.info(event)
-        self.set_peer_data(self.unit, "system-name", socket.getfqdn())
+        self.set_peer_data(self.unit, "system-name", _fqdn())
         if self.unit.is_leader():
             self._publish_tokens()
 
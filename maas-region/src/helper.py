@@ -3,15 +3,19 @@
 
 """Helper functions for MAAS management."""
 
+import contextlib
+import functools
 import logging
+import os
 import subprocess
-from os import remove
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Dict, List, Union
 
-from charms.operator_libs_linux.v2.snap import SnapCache, SnapState
+if TYPE_CHECKING:
+    from charms.operator_libs_linux.v2.snap import Snap
 
 MAAS_SNAP_NAME = "maas"
+MAAS_CLI = "/snap/bin/maas"
 MAAS_MODE = Path("/var/snap/maas/common/snap_mode")
 MAAS_SECRET = Path("/var/snap/maas/common/maas/secret")
 MAAS_ID = Path("/var/snap/maas/common/maas/maas_id")
@@ -26,6 +30,131 @@ MAAS_HTTPS_PORT = 5443
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=1)
+def _maas_snap() -> "Snap":
+    """Get the MAAS snap.
+
+    The snap library is imported on first use, so that hooks which never
+    touch the snap do not pay for loading it. The result is cached, call
+    `_maas_snap.cache_clear()` after changing the snap state.
+
+    Returns:
+        Snap: the MAAS snap
+    """
+    from charms.operator_libs_linux.v2.snap import SnapCache
+
+    return SnapCache()[MAAS_SNAP_NAME]
+
+
+def _maas_cli(args: List[str], capture: bool = False) -> str:
+    """Run a MAAS CLI command.
+
+    The charm holds no inheritable file descriptors worth protecting, so
+    `close_fds` is disabled to skip closing them in the child.
+
+    Args:
+        args (List[str]): command arguments, without the executable
+        capture (bool): whether to capture and return stdout; stderr always
+            goes to the hook log
+
+    Returns:
+        str: the command output if captured, otherwise an empty string
+
+    Raises:
+        CalledProcessError: the command failed
+    """
+    proc = subprocess.run(
+        [MAAS_CLI, *args],
+        check=True,
+        close_fds=False,
+        stdout=subprocess.PIPE if capture else None,
+    )
+    return proc.stdout.decode() if capture else ""
+
+
+@functools.lru_cache(maxsize=16)
+def _read_first_line_cached(path: Path, mtime_ns: int) -> str:
+    """Read the first line of a file.
+
+    Args:
+        path (Path): file to read
+        mtime_ns (int): modification time of the file; not read, only part of
+            the cache key so that a rewritten file is read again
+
+    Returns:
+        str: the stripped first line
+    """
+    data = path.read_bytes()
+    end = data.find(b"\n")
+    return (data if end < 0 else data[:end]).strip().decode("utf-8", "replace")
+
+
+def _read_first_line(path: Path) -> Union[str, None]:
+    """Read the first line of a MAAS state file.
+
+    Reads are cached on the file modification time, so repeated lookups
+    within a hook only cost a stat().
+
+    Args:
+        path (Path): file to read
+
+    Returns:
+        Union[str, None]: the stripped first line, or None if not readable
+    """
+    try:
+        return _read_first_line_cached(path, path.stat().st_mtime_ns)
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=4)
+def _nginx_listens_https(mtime_ns: int) -> bool:
+    """Check whether the MAAS nginx configuration listens on the HTTPS port.
+
+    Args:
+        mtime_ns (int): modification time of the nginx configuration; not
+            read, only part of the cache key so that a rewritten file is
+            checked again
+
+    Returns:
+        bool: whether nginx listens on MAAS_HTTPS_PORT
+    """
+    return b"listen %d" % MAAS_HTTPS_PORT in NGINX_CFG_FILEPATH.read_bytes()
+
+
+def _write_files(files: Dict[Path, str], overwrite: bool) -> None:
+    """Write a set of files as a single batch.
+
+    Each file is written to a temporary sibling and only published once all
+    of them are written, so a failed write never leaves a partial file at the
+    destination. Without `overwrite`, files that already exist are left
+    alone. The files only live until "maas config-tls" has read them, so
+    they are not synced to disk.
+
+    Args:
+        files (Dict[Path, str]): contents keyed by destination path
+        overwrite (bool): whether to replace files that already exist
+    """
+    written: Dict[Path, Path] = {}
+    try:
+        for path, content in files.items():
+            tmp = path.with_name(f"{path.name}.tmp")
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            written[path] = tmp
+            with os.fdopen(fd, "w") as file:
+                file.write(content)
+        for path, tmp in written.items():
+            if overwrite:
+                os.replace(tmp, path)
+            else:
+                with contextlib.suppress(FileExistsError):
+                    os.link(tmp, path)
+    finally:
+        for tmp in written.values():
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp)
+
+
 class MaasHelper:
     """MAAS helper."""
 
@@ -36,17 +165,27 @@ class MaasHelper:
         Args:
             channel (str): snapstore channel
         """
-        maas = SnapCache()[MAAS_SNAP_NAME]
+        from charms.operator_libs_linux.v2.snap import SnapState
+
+        maas = _maas_snap()
         if not maas.present:
-            maas.ensure(SnapState.Latest, channel=channel)
-            maas.hold()
+            try:
+                maas.ensure(SnapState.Latest, channel=channel)
+                maas.hold()
+            finally:
+                _maas_snap.cache_clear()
 
     @staticmethod
     def uninstall() -> None:
         """Uninstall snap."""
-        maas = SnapCache()[MAAS_SNAP_NAME]
+        from charms.operator_libs_linux.v2.snap import SnapState
+
+        maas = _maas_snap()
         if maas.present:
-            maas.ensure(SnapState.Absent)
+            try:
+                maas.ensure(SnapState.Absent)
+            finally:
+                _maas_snap.cache_clear()
 
     @staticmethod
     def get_installed_version() -> Union[str, None]:
@@ -55,7 +194,7 @@ class MaasHelper:
         Returns:
             Union[str, None]: version if installed
         """
-        maas = SnapCache()[MAAS_SNAP_NAME]
+        maas = _maas_snap()
         return maas.revision if maas.present else None
 
     @staticmethod
@@ -65,7 +204,7 @@ class MaasHelper:
         Returns:
             Union[str, None]: channel if installed
         """
-        maas = SnapCache()[MAAS_SNAP_NAME]
+        maas = _maas_snap()
         return maas.channel if maas.present else None
 
     @staticmethod
@@ -75,11 +214,7 @@ class MaasHelper:
         Returns:
             Union[str, None]: system_id, or None if not present
         """
-        try:
-            with MAAS_ID.open() as file:
-                return file.readline().strip()
-        except OSError:
-            return None
+        return _read_first_line(MAAS_ID)
 
     @staticmethod
     def get_maas_uuid() -> Union[str, None]:
@@ -88,11 +223,7 @@ class MaasHelper:
         Returns:
             Union[str, None]: UUID, or None if not present
         """
-        try:
-            with MAAS_UUID.open() as file:
-                return file.readline().strip()
-        except OSError:
-            return None
+        return _read_first_line(MAAS_UUID)
 
     @staticmethod
     def get_maas_mode() -> Union[str, None]:
@@ -101,22 +232,17 @@ class MaasHelper:
         Returns:
             Union[str, None]: mode, or None if not initialised
         """
-        try:
-            with MAAS_MODE.open() as file:
-                return file.readline().strip()
-        except OSError:
-            return None
+        return _read_first_line(MAAS_MODE)
 
     @staticmethod
     def is_running() -> bool:
         """Check if MAAS is running.
 
         Returns:
-            boot: whether the service is running
+            bool: whether the service is running
         """
-        maas = SnapCache()[MAAS_SNAP_NAME]
-        service = maas.services.get(MAAS_SERVICE, {})
-        return service.get("activate", False)
+        service = _maas_snap().services.get(MAAS_SERVICE, {})
+        return service.get("active", False)
 
     @staticmethod
     def set_running(enable: bool) -> None:
@@ -125,7 +251,7 @@ class MaasHelper:
         Args:
             enable (bool): enable service
         """
-        maas = SnapCache()[MAAS_SNAP_NAME]
+        maas = _maas_snap()
         if enable:
             maas.start()
         else:
@@ -147,7 +273,6 @@ class MaasHelper:
             CalledProcessError: failed to create user
         """
         cmd = [
-            "/snap/bin/maas",
             "createadmin",
             "--username",
             username,
@@ -159,7 +284,7 @@ class MaasHelper:
         if ssh_import is not None:
             cmd += ["--ssh-import", ssh_import]
 
-        subprocess.check_call(cmd)
+        _maas_cli(cmd)
 
     @staticmethod
     def get_api_key(username: str) -> str:
@@ -175,12 +300,11 @@ class MaasHelper:
             CalledProcessError: failed to fetch key
         """
         cmd = [
-            "/snap/bin/maas",
             "apikey",
             "--username",
             username,
         ]
-        return subprocess.check_output(cmd).decode()
+        return _maas_cli(cmd, capture=True)
 
     @staticmethod
     def setup_region(maas_url: str, dsn: str, mode: str) -> None:
@@ -198,7 +322,6 @@ class MaasHelper:
             CalledProcessError: failed to fetch key
         """
         cmd = [
-            "/snap/bin/maas",
             "init",
             mode,
             "--maas-url",
@@ -207,7 +330,7 @@ class MaasHelper:
             dsn,
             "--force",
         ]
-        subprocess.check_call(cmd)
+        _maas_cli(cmd)
 
     @staticmethod
     def set_prometheus_metrics(admin_username: str, maas_ip: str, enable: bool) -> None:
@@ -221,28 +344,23 @@ class MaasHelper:
         Raises:
             CalledProcessError: failed to set prometheus_metrics setting
         """
-        apikey = (
-            subprocess.check_output(["/snap/bin/maas", "apikey", f"--username={admin_username}"])
-            .decode()
-            .replace("\n", "")
-        )
+        apikey = _maas_cli(["apikey", f"--username={admin_username}"], capture=True)
+        apikey = apikey.replace("\n", "")
         login_cmd = [
-            "/snap/bin/maas",
             "login",
             admin_username,
             f"http://{maas_ip}:5240/MAAS/api/2.0/",
             apikey,
         ]
-        subprocess.check_call(login_cmd)
+        _maas_cli(login_cmd)
         set_cmd = [
-            "/snap/bin/maas",
             admin_username,
             "maas",
             "set-config",
             "name=prometheus_enabled",
             f"value={enable}",
         ]
-        subprocess.check_call(set_cmd)
+        _maas_cli(set_cmd)
 
     @staticmethod
     def is_tls_enabled() -> Union[bool, None]:
@@ -252,7 +370,7 @@ class MaasHelper:
             bool | None: True if MAAS has TLS enabled, False if not, None if MAAS is not initialized
         """
         try:
-            return f"listen {MAAS_HTTPS_PORT}" in NGINX_CFG_FILEPATH.read_text()
+            return _nginx_listens_https(NGINX_CFG_FILEPATH.stat().st_mtime_ns)
         except FileNotFoundError:
             # MAAS is not initialized yet, don't give false hope
             return None
@@ -260,12 +378,9 @@ class MaasHelper:
     @staticmethod
     def delete_tls_files() -> None:
         """Delete the TLS files used for setting configuring tls."""
-        if MAAS_SSL_CERT_FILEPATH.exists():
-            remove(MAAS_SSL_CERT_FILEPATH)
-        if MAAS_SSL_KEY_FILEPATH.exists():
-            remove(MAAS_SSL_KEY_FILEPATH)
-        if MAAS_CACERT_FILEPATH.exists():
-            remove(MAAS_CACERT_FILEPATH)
+        for path in (MAAS_SSL_CERT_FILEPATH, MAAS_SSL_KEY_FILEPATH, MAAS_CACERT_FILEPATH):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
 
     @staticmethod
     def create_tls_files(
@@ -279,22 +394,26 @@ class MaasHelper:
             cacert (str): optionally, contents of cacert chain for a self-signed ssl_certificate
             overwrite (bool): Whether to overwrite the files if they exist already
         """
-        if not MAAS_SSL_CERT_FILEPATH.exists() or overwrite:
-            MAAS_SSL_CERT_FILEPATH.write_text(ssl_certificate)
-        if not MAAS_SSL_KEY_FILEPATH.exists() or overwrite:
-            MAAS_SSL_KEY_FILEPATH.write_text(ssl_key)
-        if cacert and (not MAAS_CACERT_FILEPATH.exists() or overwrite):
-            MAAS_CACERT_FILEPATH.write_text(cacert)
+        files = {
+            MAAS_SSL_CERT_FILEPATH: ssl_certificate,
+            MAAS_SSL_KEY_FILEPATH: ssl_key,
+        }
+        if cacert:
+            files[MAAS_CACERT_FILEPATH] = cacert
+        _write_files(files, overwrite)
 
     @staticmethod
     def enable_tls(cacert: bool = False) -> None:
         """Set up TLS for the Region controller.
 
+        Always runs "maas config-tls enable", so it can also re-key a region
+        that already has TLS enabled. Callers that only want to turn TLS on
+        should check `is_tls_enabled` first.
+
         Raises:
             CalledProcessError: if "maas config-tls enable" command failed for any reason
         """
         cmd = [
-            "/snap/bin/maas",
             "config-tls",
             "enable",
             "--yes",
@@ -302,7 +421,7 @@ class MaasHelper:
         if cacert:
             cmd.extend(["--cacert", str(MAAS_CACERT_FILEPATH)])
         cmd.extend([str(MAAS_SSL_KEY_FILEPATH), str(MAAS_SSL_CERT_FILEPATH)])
-        subprocess.check_call(cmd)
+        _maas_cli(cmd)
 
     @staticmethod
     def disable_tls() -> None:
@@ -312,11 +431,10 @@ class MaasHelper:
             CalledProcessError: if "maas config-tls disable" command failed for any reason
         """
         cmd = [
-            "/snap/bin/maas",
             "config-tls",
             "disable",
         ]
-        subprocess.check_call(cmd)
+        _maas_cli(cmd)
 
     @staticmethod
     def msm_enroll(token: str) -> None:
@@ -328,8 +446,8 @@ class MaasHelper:
         Raises:
             CalledProcessError: if "maas msm" command failed for any reason
         """
-        cmd = ["/snap/bin/maas", "msm", "enrol", "--yes", token]
-        subprocess.check_call(cmd)
+        cmd = ["msm", "enrol", "--yes", token]
+        _maas_cli(cmd)
 
     @staticmethod
     def get_maas_secret() -> Union[str, None]:
@@ -338,8 +456,4 @@ class MaasHelper:
         Returns:
             Union[str, None]: token, or None if not present
         """
-        try:
-            with MAAS_SECRET.open() as file:
-                return file.readline().strip()
-        except OSError:
-            return None
+        return _read_first_line(MAAS_SECRET)
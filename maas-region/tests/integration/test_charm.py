@@ -3,18 +3,24 @@
 # See LICENSE file for licensing details.
 
 import asyncio
+import json
 import logging
+import os
 import time
 from pathlib import Path
-from subprocess import check_output
 
 import pytest
 import yaml
 from pytest_operator.plugin import OpsTest
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 logger = logging.getLogger(__name__)
 
-METADATA = yaml.safe_load(Path("./charmcraft.yaml").read_text())
+METADATA = yaml.load(Path("./charmcraft.yaml").read_bytes(), Loader=SafeLoader)
 APP_NAME = METADATA["name"]
 
 
@@ -24,17 +30,40 @@ async def test_build_and_deploy(ops_test: OpsTest):
 
     Assert on the unit status before any relations/configurations take place.
     """
-    # Build and deploy charm from local source folder
-    charm = await ops_test.build_charm(".")
+    # Start deploying the dependencies while the charm is being built
+    dependencies = asyncio.gather(
+        ops_test.model.deploy(
+            "postgresql",
+            application_name="postgresql",
+            channel="14/stable",
+            trust=True,
+        ),
+        ops_test.model.deploy(
+            "haproxy",
+            application_name="haproxy",
+            channel="latest/stable",
+            trust=True,
+        ),
+    )
+
+    # Build and deploy charm from local source folder, unless a prebuilt one is given
+    if charm_path := os.environ.get("CHARM_PATH"):
+        charm = Path(charm_path)
+    else:
+        charm = await ops_test.build_charm(".")
 
-    # Deploy the charm and wait for waiting/idle status
+    # Deploy the charm and wait for everything to settle, they do not need each other
     await asyncio.gather(
+        dependencies,
         ops_test.model.deploy(
             charm, application_name=APP_NAME, config={"tls_mode": "termination"}
         ),
         ops_test.model.wait_for_idle(
             apps=[APP_NAME], status="waiting", raise_on_blocked=True, timeout=1000
         ),
+        ops_test.model.wait_for_idle(
+            apps=["postgresql", "haproxy"], status="active", raise_on_blocked=True, timeout=1000
+        ),
     )
 
 
@@ -44,18 +73,6 @@ async def test_database_integration(ops_test: OpsTest):
 
     Assert that the charm is active if the integration is established.
     """
-    await asyncio.gather(
-        ops_test.model.deploy(
-            "postgresql",
-            application_name="postgresql",
-            channel="14/stable",
-            trust=True,
-        ),
-        ops_test.model.wait_for_idle(
-            apps=["postgresql"], status="active", raise_on_blocked=True, timeout=1000
-        ),
-    )
-
     await asyncio.gather(
         ops_test.model.integrate(f"{APP_NAME}", "postgresql"),
         ops_test.model.wait_for_idle(
@@ -70,40 +87,36 @@ async def test_tls_mode(ops_test: OpsTest):
 
     Assert that the agent_service is properly set up.
     """
-    # Deploy the charm and haproxy and wait for active/waiting status
-    await asyncio.gather(
-        ops_test.model.deploy(
-            "haproxy",
-            application_name="haproxy",
-            channel="latest/stable",
-            trust=True,
-        ),
-        ops_test.model.wait_for_idle(
-            apps=["haproxy"], status="active", raise_on_blocked=True, timeout=1000
-        ),
-    )
     await ops_test.model.integrate(f"{APP_NAME}", "haproxy")
     # the relation may take some time beyond the above await to fully apply
-    start = time.time()
-    timeout = 30
+    deadline = time.monotonic() + 30
+    delay = 0.05
+    env = {**os.environ, "JUJU_MODEL": ops_test.model.name}
     while True:
         try:
-            show_unit = check_output(
-                f"JUJU_MODEL={ops_test.model.name} juju show-unit haproxy/0",
-                shell=True,
-                universal_newlines=True,
+            proc = await asyncio.create_subprocess_exec(
+                "juju",
+                "show-unit",
+                "haproxy/0",
+                "--format",
+                "json",
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
             )
-            result = yaml.safe_load(show_unit)
+            show_unit, _ = await proc.communicate()
+            assert proc.returncode == 0, "juju show-unit failed"
+            result = json.loads(show_unit)
             services_str = result["haproxy/0"]["relation-info"][1]["related-units"][
                 "maas-region/0"
             ]["data"]["services"]
             break
         except KeyError:
-            time.sleep(1)
-            if time.time() > start + timeout:
+            if time.monotonic() > deadline:
                 pytest.fail("Timed out waiting for relation data to apply")
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, 1.0)
 
-    services_yaml = yaml.safe_load(services_str)
+    services_yaml = yaml.load(services_str, Loader=SafeLoader)
 
     assert len(services_yaml) == 2
     assert services_yaml[1]["service_name"] == "agent_service"
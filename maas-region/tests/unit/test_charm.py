@@ -23,6 +23,7 @@ from charm import (
     MAAS_PROXY_PORT,
     MAAS_SNAP_CHANNEL,
     MaasRegionCharm,
+    _fqdn,
 )
 
 
@@ -246,6 +247,31 @@ class TestClusterUpdates(unittest.TestCase):
         ha_data = yaml.safe_load(self.harness.get_relation_data(ha, "maas-region/0")["services"])
         self.assertEqual(len(ha_data), 1)
 
+    @patch("charm.MaasHelper", autospec=True)
+    def test_unchanged_tls_mode_keeps_ha_proxy_data(self, mock_helper):
+        self.harness.set_leader(True)
+        self.harness.begin()
+        ha = self.harness.add_relation(
+            MAAS_API_RELATION, "haproxy", unit_data={"public-address": "proxy.maas"}
+        )
+        self.harness.update_config({"tls_mode": "termination"})
+        services = self.harness.get_relation_data(ha, "maas-region/0")["services"]
+
+        setitem = ops.model.RelationDataContent.__setitem__
+        with patch.object(
+            ops.model.RelationDataContent, "__setitem__", autospec=True, side_effect=setitem
+        ) as mock_setitem:
+            self.harness.update_config({"enable_prometheus_metrics": False})
+            self.assertNotIn("services", [c.args[1] for c in mock_setitem.call_args_list])
+            self.assertEqual(
+                self.harness.get_relation_data(ha, "maas-region/0")["services"], services
+            )
+
+            self.harness.update_config({"tls_mode": "disabled"})
+            self.assertIn("services", [c.args[1] for c in mock_setitem.call_args_list])
+        ha_data = yaml.safe_load(self.harness.get_relation_data(ha, "maas-region/0")["services"])
+        self.assertEqual(len(ha_data), 1)
+
     @patch("charm.MaasHelper", autospec=True)
     def test_bad_ssl_cert_key_config(self, mock_helper):
         self.harness.set_leader(True)
@@ -276,6 +302,35 @@ class TestClusterUpdates(unittest.TestCase):
         self.assertEqual(data["regions"], f'["{socket.getfqdn()}"]')
         self.assertIn("maas_secret_id", data)  # codespell:ignore
 
+    @patch("charm.socket.getfqdn", return_value="region.maas")
+    @patch("charm.MaasHelper", autospec=True)
+    def test_fqdn_looked_up_once(self, mock_helper, mock_getfqdn):
+        _fqdn.cache_clear()
+        self.addCleanup(_fqdn.cache_clear)
+        mock_helper.get_maas_mode.return_value = "region"
+        mock_helper.get_maas_secret.return_value = "very-secret"
+        self.harness.set_leader(True)
+        self.harness.begin()
+        self.harness.add_relation(
+            maas.DEFAULT_ENDPOINT_NAME,
+            "maas-agent",
+            unit_data={"unit": "maas-agent/0", "url": "some_url"},
+        )
+        rel_id = self.harness.add_relation(MAAS_PEER_NAME, "maas-region")
+        self.harness.add_relation_unit(rel_id, "maas-region/1")
+        self.harness.update_relation_data(
+            rel_id, "maas-region/1", {"system-name": json.dumps("other.host.local")}
+        )
+        self.assertEqual(
+            self.harness.get_relation_data(rel_id, "maas-region/0")["system-name"],
+            json.dumps("region.maas"),
+        )
+        self.assertEqual(self.harness.charm.get_operational_mode(), "region")
+        self.assertCountEqual(
+            self.harness.charm._get_regions(), ["region.maas", "other.host.local"]
+        )
+        mock_getfqdn.assert_called_once()
+
     @patch("charm.MaasHelper", autospec=True)
     def test_on_maas_cluster_changed_prometheus_enabled(self, mock_helper):
         mock_helper.get_maas_mode.return_value = "region"